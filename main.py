@@ -1,36 +1,116 @@
+import asyncio
+import contextlib
+import dbm
+import functools
+import glob
 import os
 import re
+import shelve
+import time
 import yaml
+import ahocorasick
 import feedparser
 import httpx
+import orjson
+import xxhash
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from html import escape
-from urllib.parse import urlsplit, urlunsplit
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from xml.etree.ElementTree import ParseError, tostring
+from defusedxml import DefusedXmlException
+import defusedxml.ElementTree as SafeET
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as YamlLoader
 
 BUCHAREST = ZoneInfo("Europe/Bucharest")
 TELEGRAM_LIMIT = 3900  # safe under 4096
+EMPTY_SECTION = "• (nimic relevant după filtrare)\n"
+FETCH_TIMEOUT = 30
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE = 16
+FEED_CACHE_PATH = ".cache/feeds.db"
+FEED_HEADERS = {
+    "User-Agent": "news-agent/1",
+    "Accept-Encoding": "gzip, br",  # br is decoded by the brotli package
+}
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+RDF_NS = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
+RSS1_NS = "{http://purl.org/rss/1.0/}"
+CONTENT_NS = "{http://purl.org/rss/1.0/modules/content/}"
+XML_BASE = "{http://www.w3.org/XML/1998/namespace}base"
+XHTML_NS = "{http://www.w3.org/1999/xhtml}"
+
+_RE_TAG = re.compile(r"<[^>]+>")
+_RE_WS = re.compile(r"\s+")
+_RE_CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+_RE_XML_ENCODING = re.compile(rb"\s*<\?xml[^>]*\bencoding=")
+_BOMS = (b"\xef\xbb\xbf", b"\xff\xfe", b"\xfe\xff")
+
+
+@functools.lru_cache(maxsize=1)
+def load_config(path: str = "config.yaml"):
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+
+def _normalize(text: str) -> str:
+    t = (text or "").lower()
+    t = _RE_TAG.sub(" ", t)
+    return _RE_WS.sub(" ", t).strip()
 
 
-def load_config():
-    with open("config.yaml", "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
-
-
+@functools.lru_cache(maxsize=4096)
 def normalize_text(text: str) -> str:
-    t = (text or "").lower()
-    t = re.sub(r"<[^>]+>", " ", t)
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
+    # Cached for short, repeated strings (titles, keywords); summaries and
+    # links are one-off and go through _normalize directly.
+    return _normalize(text)
 
 
-def contains_any(text: str, keywords: list[str]) -> bool:
-    hay = normalize_text(text)
+def normalize_keywords(keywords: list[str]) -> list[str]:
+    # dict keeps first-seen order while dropping repeats (e.g. RO/EN "accident")
+    out = {}
     for k in keywords or []:
+        # Empty YAML items (`- ` or `~`) come through as None
+        if not isinstance(k, str):
+            continue
         kk = normalize_text(k)
-        if kk and kk in hay:
-            return True
-    return False
+        if kk:
+            out[kk] = None
+    return list(out)
+
+
+def build_matcher(keywords: list[str]):
+    """
+    Compile normalized keywords into one Aho-Corasick automaton so each text
+    is scanned once, whatever the number of keywords. None if there are none.
+    """
+    if not keywords:
+        return None
+    # A keyword containing a shorter one can never decide a match on its own
+    # (keywords arrive deduplicated from normalize_keywords)
+    shortest_first = sorted(keywords, key=len)
+    kept = []
+    for k in shortest_first:
+        if not any(short in k for short in kept):
+            kept.append(k)
+
+    automaton = ahocorasick.Automaton()
+    for k in kept:
+        automaton.add_word(k, k)
+    automaton.make_automaton()
+    return automaton
+
+
+def contains_any(nhay: str, matcher) -> bool:
+    """nhay must already be normalized (see normalize_text)."""
+    if matcher is None:
+        return False
+    return next(matcher.iter(nhay), None) is not None
 
 
 def canonical_link(url: str) -> str:
@@ -45,9 +125,209 @@ def canonical_link(url: str) -> str:
     return urlunsplit((parts.scheme, parts.netloc, parts.path, parts.query, ""))
 
 
-def fetch_entries(feed_url: str, limit: int):
-    feed = feedparser.parse(feed_url)
-    return (getattr(feed, "entries", []) or [])[:limit]
+async def fetch_feed(client: httpx.AsyncClient, url: str, cached: dict) -> httpx.Response | None:
+    # Conditional GET: an unchanged feed answers 304 with no body
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    # A failing feed yields no entries instead of aborting the whole brief
+    try:
+        r = await client.get(url, headers=headers)
+        if r.status_code != 304:
+            r.raise_for_status()
+    except (httpx.HTTPError, httpx.InvalidURL):
+        return None
+    return r
+
+
+async def fetch_responses(urls: list[str], cached: list[dict]) -> list[httpx.Response | None]:
+    """
+    Download all feeds concurrently over one pooled HTTP/2 client.
+    Parsing is left to the caller so it can run serially.
+    """
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE
+    )
+    async with httpx.AsyncClient(
+        http2=True,
+        follow_redirects=True,
+        headers=FEED_HEADERS,
+        timeout=FETCH_TIMEOUT,
+        limits=limits,
+    ) as client:
+        return await asyncio.gather(
+            *(fetch_feed(client, url, c) for url, c in zip(urls, cached))
+        )
+
+
+def _atom_link(entry, base: str) -> str:
+    for link in entry.findall(f"{ATOM_NS}link"):
+        if link.get("rel", "alternate") == "alternate":
+            href = link.get("href", "").strip()
+            return urljoin(urljoin(base, link.get(XML_BASE, "")), href) if href else ""
+    return ""
+
+
+def _atom_text(el) -> str:
+    if el is None:
+        return ""
+    div = el.find(f"{XHTML_NS}div")
+    if el.get("type") != "xhtml" or div is None:
+        return "".join(el.itertext())
+
+    # type="xhtml": the markup inside the wrapping <div>, as feedparser gives it
+    for child in div.iter():
+        if child.tag.startswith(XHTML_NS):
+            child.tag = child.tag[len(XHTML_NS) :]
+    inner = escape(div.text or "", quote=False)
+    return inner + "".join(tostring(child, encoding="unicode") for child in div)
+
+
+def _rss_link(item, ns: str, base: str) -> str:
+    link = item.findtext(f"{ns}link", "").strip()
+    if not link:
+        # RSS 2.0: a guid is a permalink unless isPermaLink="false"
+        guid = item.find("guid")
+        if guid is not None and guid.get("isPermaLink", "true").lower() != "false":
+            link = (guid.text or "").strip()
+    return urljoin(base, link) if link else ""
+
+
+def _decode_body(body: bytes, content_type: str) -> bytes | str:
+    """
+    Without a BOM or an XML encoding declaration the HTTP charset decides the
+    encoding; otherwise leave the bytes for the XML parser to decode.
+    """
+    m = _RE_CHARSET.search(content_type or "")
+    if not m or body.startswith(_BOMS) or _RE_XML_ENCODING.match(body):
+        return body
+    try:
+        return body.decode(m.group(1))
+    except (LookupError, UnicodeDecodeError):
+        return body
+
+
+def parse_xml_entries(body: bytes, url: str = "", content_type: str = "") -> list[dict] | None:
+    """
+    Pull title/link/summary straight out of an RSS 2.0, RSS 1.0 (RDF) or Atom
+    document. Links are resolved against `url` and any xml:base.
+    None if the body is not well-formed XML in one of those shapes.
+    """
+    try:
+        root = SafeET.fromstring(_decode_body(body, content_type))
+    except (ParseError, DefusedXmlException):
+        return None
+
+    base = urljoin(url, root.get(XML_BASE, ""))
+
+    if root.tag == f"{ATOM_NS}feed":
+        return [
+            {
+                "title": _atom_text(e.find(f"{ATOM_NS}title")),
+                "link": _atom_link(e, urljoin(base, e.get(XML_BASE, ""))),
+                "summary": _atom_text(e.find(f"{ATOM_NS}summary"))
+                or _atom_text(e.find(f"{ATOM_NS}content")),
+            }
+            for e in root.iter(f"{ATOM_NS}entry")
+        ]
+
+    if root.tag == "rss":
+        ns = ""
+    elif root.tag == f"{RDF_NS}RDF":
+        ns = RSS1_NS
+    else:
+        return None
+
+    return [
+        {
+            "title": it.findtext(f"{ns}title", ""),
+            "link": _rss_link(it, ns, urljoin(base, it.get(XML_BASE, ""))),
+            "summary": it.findtext(f"{ns}description")
+            or it.findtext(f"{CONTENT_NS}encoded", ""),
+        }
+        for it in root.iter(f"{ns}item")
+    ]
+
+
+def parse_entries(body: bytes, url: str = "", content_type: str = "") -> list[dict]:
+    entries = parse_xml_entries(body, url, content_type)
+    if entries is not None:
+        return entries
+
+    # Malformed or unusual feeds: let feedparser recover what it can, with
+    # the same base URL and charset it used to get from fetching itself
+    feed = feedparser.parse(
+        body,
+        response_headers={"content-location": url, "content-type": content_type},
+    )
+    return [
+        {
+            "title": e.get("title", ""),
+            "link": e.get("link", ""),
+            "summary": e.get("summary", ""),
+        }
+        for e in getattr(feed, "entries", []) or []
+    ]
+
+
+def open_feed_cache():
+    """
+    Open the on-disk feed cache as a context manager. An unreadable or
+    incompatible cache (truncated restore, different dbm backend) is
+    recreated; if that fails too, an empty in-memory cache is used so the
+    run only loses its conditional requests.
+    """
+    try:
+        os.makedirs(os.path.dirname(FEED_CACHE_PATH), exist_ok=True)
+        return shelve.open(FEED_CACHE_PATH)
+    except (*dbm.error, OSError):
+        pass
+
+    try:
+        for path in glob.glob(f"{FEED_CACHE_PATH}*"):
+            os.remove(path)
+        return shelve.open(FEED_CACHE_PATH, "n")
+    except (*dbm.error, OSError):
+        return contextlib.nullcontext({})
+
+
+def fetch_feeds(urls: list[str], limit: int) -> list[list[dict]]:
+    """
+    Fetch and parse every feed, returning up to `limit` entries per feed.
+    Parsed entries are kept on disk keyed by ETag/Last-Modified, so a feed
+    that has not changed since the last run costs a 304 and no parsing.
+    """
+    with open_feed_cache() as cache:
+        cached = [cache.get(url, {}) for url in urls]
+        responses = asyncio.run(fetch_responses(urls, cached))
+
+        out = []
+        for url, hit, r in zip(urls, cached, responses):
+            if r is None:
+                out.append([])
+                continue
+            if r.status_code == 304:
+                out.append(hit.get("entries", [])[:limit])
+                continue
+
+            # r.url is the final URL after redirects: the base for relative links
+            entries = parse_entries(r.content, str(r.url), r.headers.get("content-type", ""))
+            etag = r.headers.get("etag")
+            last_modified = r.headers.get("last-modified")
+            if etag or last_modified:
+                cache[url] = {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "entries": entries,
+                    "fetched": time.time(),
+                }
+            elif url in cache:
+                del cache[url]
+            out.append(entries[:limit])
+        return out
 
 
 def send_telegram_html(text: str):
@@ -57,41 +337,44 @@ def send_telegram_html(text: str):
 
     r = httpx.post(
         url,
-        json={
-            "chat_id": chat_id,
-            "text": text,
-            "parse_mode": "HTML",
-            "disable_web_page_preview": True,
-        },
+        content=orjson.dumps(
+            {
+                "chat_id": chat_id,
+                "text": text,
+                "parse_mode": "HTML",
+                "disable_web_page_preview": True,
+            }
+        ),
+        headers={"Content-Type": "application/json"},
         timeout=30,
     )
     r.raise_for_status()
 
 
+def render_item(it: dict) -> str:
+    # Fields are escaped once when the item is collected
+    return (
+        f'• {it["title_h"]} — <a href="{it["link_h"]}">Citește</a> '
+        f'<i>({it["source_h"]})</i>\n'
+    )
+
+
 def build_message(date_str: str, ro_items: list[dict], world_items: list[dict]) -> str:
-    msg = f"🗞️ <b>Daily Brief — {escape(date_str)}</b>\n\n"
+    parts = [f"🗞️ <b>Daily Brief — {escape(date_str)}</b>\n\n"]
 
-    msg += "🇷🇴 <b>România</b>\n"
+    parts.append("🇷🇴 <b>România</b>\n")
     if not ro_items:
-        msg += "• (nimic relevant după filtrare)\n"
+        parts.append(EMPTY_SECTION)
     else:
-        for it in ro_items:
-            title = escape(it["title"])
-            link = escape(it["link"])
-            src = escape(it["source"])
-            msg += f'• {title} — <a href="{link}">Citește</a> <i>({src})</i>\n'
+        parts.extend(render_item(it) for it in ro_items)
 
-    msg += "\n🌍 <b>Global</b>\n"
+    parts.append("\n🌍 <b>Global</b>\n")
     if not world_items:
-        msg += "• (nimic relevant după filtrare)\n"
+        parts.append(EMPTY_SECTION)
     else:
-        for it in world_items:
-            title = escape(it["title"])
-            link = escape(it["link"])
-            src = escape(it["source"])
-            msg += f'• {title} — <a href="{link}">Citește</a> <i>({src})</i>\n'
+        parts.extend(render_item(it) for it in world_items)
 
-    return msg.strip()
+    return "".join(parts).strip()
 
 
 def main():
@@ -103,7 +386,8 @@ def main():
     world_top = int(settings.get("world_top", 10))
     max_total_items = int(settings.get("max_total_items", 18))
 
-    exclude_any = cfg.get("filters", {}).get("exclude_any", [])
+    exclude_any = normalize_keywords(cfg.get("filters", {}).get("exclude_any", []))
+    exclude_matcher = build_matcher(exclude_any)
 
     feeds = cfg.get("feeds", {})
     ro_feeds = feeds.get("romania", [])
@@ -113,41 +397,69 @@ def main():
     seen_links = set()
     seen_titles = set()
 
-    def collect(feed_defs: list[dict]) -> list[dict]:
+    def sources(feed_defs: list[dict]) -> list[tuple[str, str]]:
         out = []
         for fd in feed_defs:
             name = str(fd.get("name", "Source")).strip()
             url = str(fd.get("url", "")).strip()
-            if not url:
-                continue
+            if url:
+                out.append((name, url))
+        return out
 
-            for e in fetch_entries(url, scan_per_feed):
-                title = (getattr(e, "title", "") or "").strip()
-                link = canonical_link(getattr(e, "link", "") or "")
-                summary = (getattr(e, "summary", "") or "").strip()
+    def collect(fetched: list[tuple[str, list]]) -> list[dict]:
+        out = []
+        for name, entries in fetched:
+            name_h = escape(name)
+            for e in entries:
+                title = (e["title"] or "").strip()
+                link = canonical_link(e["link"] or "")
+                summary = (e["summary"] or "").strip()
 
                 if not title or not link:
                     continue
 
-                hay = f"{title} {summary} {link}"
-
-                # Exclude deaths/crime/etc.
-                if contains_any(hay, exclude_any):
+                # Dedupe first: link + normalized title (cheap set lookups on
+                # 64-bit fingerprints that skip the keyword scan for repeats)
+                nt = normalize_text(title)
+                link_key = xxhash.xxh3_64_intdigest(link.encode())
+                title_key = xxhash.xxh3_64_intdigest(nt.encode())
+                if link_key in seen_links or title_key in seen_titles:
                     continue
 
-                # Dedupe: link + normalized title
-                nt = normalize_text(title)
-                if link in seen_links or nt in seen_titles:
+                # Exclude deaths/crime/etc. Fields are checked one at a time,
+                # title first, so a hit skips normalizing the (often long)
+                # summary.
+                if contains_any(nt, exclude_matcher) or any(
+                    contains_any(_normalize(field), exclude_matcher)
+                    for field in (summary, link)
+                ):
                     continue
 
-                seen_links.add(link)
-                seen_titles.add(nt)
+                seen_links.add(link_key)
+                seen_titles.add(title_key)
 
-                out.append({"title": title, "link": link, "source": name})
+                out.append(
+                    {
+                        "title_h": escape(title),
+                        "link_h": escape(link),
+                        "source_h": name_h,
+                    }
+                )
         return out
 
-    ro_items = collect(ro_feeds)
-    world_items = collect(world_feeds)
+    ro_sources = sources(ro_feeds)
+    world_sources = sources(world_feeds)
+
+    # Network-bound: download every feed concurrently, then parse serially
+    all_sources = ro_sources + world_sources
+    all_entries = fetch_feeds([url for _, url in all_sources], scan_per_feed)
+    fetched = [(name, entries) for (name, _), entries in zip(all_sources, all_entries)]
+
+    ro_fetched = fetched[: len(ro_sources)]
+    world_fetched = fetched[len(ro_sources) :]
+
+    ro_items = collect(ro_fetched)
+    world_items = collect(world_fetched)
 
     # Limit per section + total (one message)
     ro_items = ro_items[:romania_top]
@@ -161,17 +473,26 @@ def main():
         world_items = [x for x in combined if x in world_items]
 
     date_str = datetime.now(BUCHAREST).strftime("%d %b %Y")
-    msg = build_message(date_str, ro_items, world_items)
 
-    # If still too long, shrink items until it fits (keeps one message)
-    while len(msg) > TELEGRAM_LIMIT and (ro_items or world_items):
+    # If still too long, shrink items until it fits (keeps one message).
+    # Lengths are tracked per line so the brief is only rendered once more.
+    ro_lens = [len(render_item(it)) for it in ro_items]
+    world_lens = [len(render_item(it)) for it in world_items]
+    msg_len = len(build_message(date_str, ro_items, world_items))
+    while msg_len > TELEGRAM_LIMIT and (ro_items or world_items):
         # remove one from the bigger section
         if len(world_items) >= len(ro_items) and world_items:
-            world_items = world_items[:-1]
+            world_items.pop()
+            msg_len -= world_lens.pop()
+            if not world_items:
+                msg_len += len(EMPTY_SECTION)
         elif ro_items:
-            ro_items = ro_items[:-1]
-        msg = build_message(date_str, ro_items, world_items)
+            ro_items.pop()
+            msg_len -= ro_lens.pop()
+            if not ro_items:
+                msg_len += len(EMPTY_SECTION)
 
+    msg = build_message(date_str, ro_items, world_items)
     send_telegram_html(msg)
 
 
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import feedparser
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures"
+FEED_URL = "https://example.com/feeds/rss.xml"
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "rss_plain.xml",
+        "rss_content_encoded.xml",
+        "rss_guid_permalink.xml",
+        "rss_relative_link.xml",
+        "atom_xhtml.xml",
+        "atom_xml_base.xml",
+    ],
+)
+def test_matches_feedparser(name):
+    body = (FIXTURES / name).read_bytes()
+
+    ours = main.parse_xml_entries(body, FEED_URL)
+    theirs = feedparser.parse(body, response_headers={"content-location": FEED_URL}).entries
+
+    assert ours is not None
+    assert len(ours) == len(theirs)
+    for got, want in zip(ours, theirs):
+        # The raw title is what gets escaped and shown in the brief
+        assert got["title"].strip() == want.get("title", "")
+        assert got["link"] == want.get("link", "")
+        # Summaries only feed the exclude filter, which strips markup
+        assert main.normalize_text(got["summary"]) == main.normalize_text(want.get("summary", ""))
+        assert got["title"] and got["link"] and got["summary"]
+
+
+def test_relative_link_is_resolved_against_feed_url():
+    body = (FIXTURES / "rss_relative_link.xml").read_bytes()
+    assert main.parse_xml_entries(body, FEED_URL)[0]["link"] == "https://example.com/news/1"
+
+
+def test_malformed_body_is_left_to_feedparser():
+    assert main.parse_xml_entries(b"<rss><channel><item>") is None